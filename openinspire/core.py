@@ -1,19 +1,41 @@
 import os
+import json
+import re
 import yaml
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 import zipfile
+import numpy as np
+import pandas as pd
 import geopandas as gpd
+import pyogrio
+import pyproj
+import shapely
+from osgeo import ogr
 from bs4 import BeautifulSoup
 from urllib.parse import urljoin, urlparse
 import signal
-import shutil
 import sys
 import concurrent.futures
 import threading
+import queue
+import collections
+
+# Files are grouped by size so that many small files can be fetched with high
+# concurrency without a handful of large files saturating the connection
+SMALL_FILE_SIZE = 5 * 1024 * 1024
+LARGE_FILE_SIZE = 50 * 1024 * 1024
+
+# How often the confirmed size of a .part file is recorded, bounding how much has to be
+# fetched again when resuming after a run was killed
+PART_CHECKPOINT_SIZE = 64 * 1024 * 1024
 
 class openinspire:
     def __init__(self, config_path):
         self.print_lock = threading.Lock()
+        self.meta_lock = threading.Lock()
+        self.zip_lock = threading.Lock()
 
         if not os.path.exists(config_path):
             raise FileNotFoundError(f"Config file not found: {config_path}")
@@ -23,27 +45,140 @@ class openinspire:
         
         self.base_url = self.config.get('source')
         self.cache_dir = self.config.get('cache_dir', './cache')
-        self.extract_dir = os.path.join(self.cache_dir, "gml_temp")
-        self.target_crs = "EPSG:27700"
+        # Parsed once here rather than from a string every time a file's CRS is checked
+        self.target_crs = pyproj.CRS.from_user_input("EPSG:27700")
+
+        # Per-thread cache of pyproj Transformers keyed by source CRS, as INSPIRE files
+        # nearly always share one CRS and building a PROJ pipeline per file is wasteful
+        self.transformers = threading.local()
+
+        # Parallel downloads for small, medium and large files, see run_downloads
+        self.download_concurrency = {
+            'small': self._positive_int('download_concurrency_small', 16),
+            'medium': self._positive_int('download_concurrency_medium', 8),
+            'large': self._positive_int('download_concurrency_large', 3),
+        }
+
+        # Threads decompressing and parsing downloaded ZIPs
+        self.parse_workers = self._positive_int('parse_workers', os.cpu_count() or 1)
+
+        # Number of features to accumulate before each write to the output file
+        self.write_batch_rows = self._positive_int('write_batch_rows', 500000)
+
+        # Attribute columns to read from each GML (geometry is always kept); None reads all
+        self.keep_columns = self.config.get('keep_columns')
+
+        # When keep_cache is false, each ZIP is deleted once all its data is in the output
+        self.keep_cache = self.config.get('keep_cache', True)
+        self.pending_zips = collections.Counter()
+        self.failed_zips = set()
+
+        # Shared across threads so connections to the server are kept alive and reused
+        # rather than paying a new TCP+TLS handshake for every file
+        self.session = requests.Session()
+
+        # Pool is sized for the highest download concurrency (or the 16 size probes), and
+        # transient server errors are retried with backoff rather than failing the file
+        adapter = HTTPAdapter(
+            pool_connections=32,
+            pool_maxsize=max(16, *self.download_concurrency.values()),
+            max_retries=Retry(total=3, backoff_factor=0.5, status_forcelist=[502, 503, 504])
+        )
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+        # Accept-Encoding is left to requests, which advertises every encoding it can decode
+        self.session.headers.update({'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64)'})
         
         config_base = os.path.splitext(os.path.basename(config_path))[0]
         raw_output = self.config.get('output', 'inspire.gpkg')
         self.output_gpkg = raw_output.replace('[SCRIPTNAME]', config_base)
+        self.output_layer = os.path.splitext(os.path.basename(self.output_gpkg))[0]
         
         os.makedirs(self.cache_dir, exist_ok=True)
-        if os.path.exists(self.extract_dir):
-            shutil.rmtree(self.extract_dir)
-        os.makedirs(self.extract_dir, exist_ok=True)
+
+        # ETag / Last-Modified of each downloaded file, keyed by URL
+        self.http_meta_path = os.path.join(self.cache_dir, '.http_meta.json')
+        self.http_meta = self._load_http_meta()
+
+    def _positive_int(self, key, default):
+        # Checked up front, as a bad value would otherwise only fail inside a worker thread
+        value = self.config.get(key, default)
+        if isinstance(value, bool) or not isinstance(value, int) or value < 1:
+            raise ValueError(f"{key} must be a positive integer, got: {value!r}")
+        return value
 
     def log(self, message):
         with self.print_lock:
             print(f"[openinspire] {message}", flush=True)
 
+    def _load_http_meta(self):
+        if not os.path.exists(self.http_meta_path):
+            return {}
+        try:
+            with open(self.http_meta_path, 'r') as f:
+                return json.load(f)
+        except (OSError, ValueError) as e:
+            self.log(f"Ignoring unreadable HTTP metadata {self.http_meta_path}: {e}")
+            return {}
+
+    def _get_http_meta(self, url):
+        with self.meta_lock:
+            return self.http_meta.get(url)
+
+    def _save_http_meta(self):
+        # Caller must hold meta_lock. Write to a temporary file first so an interrupted
+        # run never leaves truncated JSON
+        tmp_path = self.http_meta_path + '.part'
+        with open(tmp_path, 'w') as f:
+            json.dump(self.http_meta, f, indent=2)
+        os.replace(tmp_path, self.http_meta_path)
+
+    def _set_http_meta(self, url, headers):
+        with self.meta_lock:
+            self.http_meta[url] = {
+                'etag': headers.get('ETag'),
+                'last_modified': headers.get('Last-Modified'),
+            }
+            self._save_http_meta()
+
+    def _set_part_meta(self, url, headers):
+        # Validators of the response a .part file is being written from, used with If-Range
+        # so a resume never appends bytes from a different version of the file
+        with self.meta_lock:
+            self.http_meta.setdefault(url, {})['part'] = {
+                'etag': headers.get('ETag'),
+                'last_modified': headers.get('Last-Modified'),
+                'length': None if headers.get('Content-Encoding') else self._content_length(headers),
+                'offset': 0,
+            }
+            self._save_http_meta()
+
+    def _set_part_offset(self, url, offset):
+        # Bytes of the .part file known to hold downloaded data. The file itself may be
+        # longer, as it is preallocated and a killed run never gets to truncate it
+        with self.meta_lock:
+            part_meta = self.http_meta.get(url, {}).get('part')
+            if part_meta is not None:
+                part_meta['offset'] = offset
+                self._save_http_meta()
+
+    def _range_matches(self, r, offset, expected_length):
+        # A 206 is only safe to append if it starts exactly where the .part file ends and
+        # runs to the end of the same-sized file
+        match = re.fullmatch(r'bytes (\d+)-(\d+)/(\d+|\*)', r.headers.get('Content-Range', '').strip())
+        if match is None or int(match.group(1)) != offset:
+            return False
+        if match.group(3) == '*':
+            return expected_length is None
+        length = int(match.group(3))
+        if expected_length is not None and length != expected_length:
+            return False
+        return int(match.group(2)) == length - 1
+
     def _get_links(self):
         self.log(f"Scraping source: {self.base_url}")
         try:
-            headers = {'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64)'}
-            r = requests.get(self.base_url, headers=headers, timeout=30)
+            r = self.session.get(self.base_url, timeout=30)
             soup = BeautifulSoup(r.text, 'html.parser')
             
             links = []
@@ -58,13 +193,63 @@ class openinspire:
             self.log(f"Failed to scrape links: {e}")
             return []
 
-    def run_downloads(self, links):
-        self.log("--- Phase 1: Parallel Downloading ---")
+    def _probe_head(self, url):
+        try:
+            r = self.session.head(url, allow_redirects=True, timeout=30)
+            r.raise_for_status()
+            return r.headers
+        except Exception:
+            return None
+
+    def _probe_heads(self, links):
+        # HEAD responses are kept so _download_file can reuse them rather than probing again
+        with concurrent.futures.ThreadPoolExecutor(max_workers=16) as executor:
+            return dict(zip(links, executor.map(self._probe_head, links)))
+
+    def _content_length(self, headers):
+        try:
+            return int(headers['Content-Length'])
+        except (TypeError, KeyError, ValueError):
+            return None
+
+    def run_downloads(self, links, dl_done_q):
         total_links = len(links)
-        
-        # We recommend 4-8 workers. Too many might get your IP blocked by the server.
-        max_workers = 5 
+        indexes = {url: index for index, url in enumerate(links, 1)}
+
+        self.log(f"Probing sizes of {total_links} files...")
+        heads = self._probe_heads(links)
+        sizes = {url: self._content_length(heads[url]) for url in links}
+
+        # Largest files start first overall (longest-processing-time scheduling), so a big
+        # file isn't left downloading, then parsing, alone at the end; unknown sizes are
+        # treated as medium
+        by_size = sorted(links, key=lambda url: sizes[url] or 0, reverse=True)
+        small, medium, large = [], [], []
+        for url in by_size:
+            size = sizes[url]
+            if size is not None and size < SMALL_FILE_SIZE:
+                small.append(url)
+            elif size is not None and size > LARGE_FILE_SIZE:
+                large.append(url)
+            else:
+                medium.append(url)
+
+        # Too many workers on large files might get your IP blocked by the server
+        chunks = [
+            ('large', large, self.download_concurrency['large']),
+            ('medium', medium, self.download_concurrency['medium']),
+            ('small', small, self.download_concurrency['small']),
+        ]
+
+        for label, chunk, max_workers in chunks:
+            if not chunk:
+                continue
+            self.log(f"Downloading {len(chunk)} {label} files with {max_workers} workers...")
+            self._download_chunk(chunk, indexes, heads, total_links, max_workers, dl_done_q)
 
+        self.log("--- All Downloads Complete ---")
+
+    def _download_chunk(self, urls, indexes, heads, total_links, max_workers, dl_done_q):
         with concurrent.futures.ThreadPoolExecutor(max_workers=max_workers) as executor:
             # Create a list of tasks
             # We map each URL to the download function with its index
@@ -73,91 +258,415 @@ class openinspire:
                     self._download_file, 
                     url, 
                     os.path.basename(urlparse(url).path), 
-                    index, 
-                    total_links
-                ) : (index, url)
-                for index, url in enumerate(links, 1)
+                    indexes[url], 
+                    total_links,
+                    heads[url]
+                ) : (indexes[url], url)
+                for url in urls
             }
 
             for future in concurrent.futures.as_completed(future_to_url):
                 index, url = future_to_url[future]
                 filename = os.path.basename(urlparse(url).path)
+                zip_path = os.path.join(self.cache_dir, filename)
                 try:
                     future.result()
                     self.log(f"[{index}/{total_links}] Finished: {filename}")
                 except Exception as e:
                     self.log(f"[{index}/{total_links}] FAILED: {filename} - {e}")
+                    if not os.path.exists(zip_path):
+                        continue
+                    self.log(f"[{index}/{total_links}] Using cached copy: {filename}")
 
-        self.log("--- All Downloads Complete ---")
+                # Hand the ZIP straight over to the parser threads
+                dl_done_q.put((index, total_links, zip_path))
 
-    def _download_file(self, url, filename, index, total):
+    def _download_file(self, url, filename, index, total, head=None):
         target_path = os.path.join(self.cache_dir, filename)
+        part_path = target_path + '.part'
+        headers = {}
 
-        # 1. Check if file exists locally
-        if os.path.exists(target_path):
-            file_size = os.path.getsize(target_path)
-            if file_size > 0:
-                # We log that we're skipping it
-                self.log(f"[{index}/{total}] Skipping (already exists): {filename}")
-                return # Exit the function early
+        try:
+            local_size = os.stat(target_path).st_size
+        except FileNotFoundError:
+            local_size = 0
 
-        # 2. If it doesn't exist, proceed with the download
+        # 1. If file exists locally, only download it again if the server has a newer version
+        if local_size > 0:
+            meta = self._get_http_meta(url) or {}
+            if not (meta.get('etag') or meta.get('last_modified')):
+                # No validators stored for this file (e.g. cache from an older version, or a
+                # server that sends neither header), so compare sizes with a HEAD request
+                # before deciding to redownload (reusing the one from _probe_heads if there is one)
+                if head is None:
+                    r = self.session.head(url, allow_redirects=True, timeout=30)
+                    r.raise_for_status()
+                    head = r.headers
+                remote_size = head.get('Content-Length')
+                if remote_size is None or int(remote_size) == local_size:
+                    self._set_http_meta(url, head)
+                    self.log(f"[{index}/{total}] Skipping (already exists): {filename}")
+                    return
+            else:
+                if meta.get('etag'):
+                    headers['If-None-Match'] = meta['etag']
+                if meta.get('last_modified'):
+                    headers['If-Modified-Since'] = meta['last_modified']
+
+        # 2. Download to a .part file, resuming a previous partial download if there is one
         try:
-            r = requests.get(url, stream=True, timeout=60)
+            part_size = os.stat(part_path).st_size
+        except FileNotFoundError:
+            part_size = 0
+
+        part_meta = (self._get_http_meta(url) or {}).get('part') or {}
+        part_validator = part_meta.get('etag') or part_meta.get('last_modified')
+        offset = min(part_size, part_meta.get('offset') or 0)
+        if offset > 0 and part_validator:
+            # Drop preallocated or unconfirmed bytes so appending continues from the offset
+            if part_size > offset:
+                os.truncate(part_path, offset)
+            # If the file has changed since, If-Range makes the server send all of it instead
+            headers['Range'] = f'bytes={offset}-'
+            headers['If-Range'] = part_validator
+            headers['Accept-Encoding'] = 'identity'
+        else:
+            offset = 0
+
+        with self.session.get(url, headers=headers, stream=True, timeout=60) as r:
+            if r.status_code == 304:
+                self.log(f"[{index}/{total}] Skipping (unchanged on server): {filename}")
+                if os.path.exists(part_path):
+                    os.remove(part_path)
+                return
+            if r.status_code == 416 and offset > 0:
+                # Nothing left to fetch from this offset, e.g. the file on the server has
+                # shrunk, so start again from scratch
+                os.remove(part_path)
+                self.log(f"[{index}/{total}] Restarting download: {filename}")
+                return self._download_file(url, filename, index, total, head)
             r.raise_for_status()
-            with open(target_path, 'wb') as f:
-                for chunk in r.iter_content(chunk_size=8192):
-                    f.write(chunk)
-        except Exception as e:
-            # Clean up partial file if download failed 
-            # so it doesn't trigger the 'exists' check next time
-            if os.path.exists(target_path):
-                os.remove(target_path)
-            raise e
-        
-    def _unzip_all(self):
-        zip_files = [os.path.join(self.cache_dir, f) for f in os.listdir(self.cache_dir) if f.endswith('.zip')]
-        total_zips = len(zip_files)
+
+            if r.status_code == 206:
+                expected_length = part_meta.get('length') or self._content_length(head)
+                if not self._range_matches(r, offset, expected_length):
+                    os.remove(part_path)
+                    self.log(f"[{index}/{total}] Unexpected Content-Range, restarting download: {filename}")
+                    return self._download_file(url, filename, index, total, head)
+                mode = 'ab'
+                self.log(f"[{index}/{total}] Resuming from {offset} bytes: {filename}")
+            else:
+                # Server ignored the Range or the file has changed, so start over
+                mode, offset = 'wb', 0
+                self._set_part_meta(url, r.headers)
+
+            # 1MB chunks keep the number of Python-level read/write calls low on multi-GB files
+            written, checkpoint = 0, 0
+            with open(part_path, mode) as f:
+                if offset == 0:
+                    self._preallocate(f, r)
+                try:
+                    for chunk in r.iter_content(chunk_size=1 << 20):
+                        f.write(chunk)
+                        written += len(chunk)
+                        if written - checkpoint >= PART_CHECKPOINT_SIZE:
+                            f.flush()
+                            self._set_part_offset(url, offset + written)
+                            checkpoint = written
+                finally:
+                    # Drop any preallocated space past the data received and record how
+                    # far we got, so a later attempt resumes from the right offset
+                    f.truncate(offset + written)
+                    self._set_part_offset(url, offset + written)
+
+            content_length = r.headers.get('Content-Length')
+            if content_length is not None and not r.headers.get('Content-Encoding') and written != int(content_length):
+                raise IOError(f"Incomplete download, received {written} of {content_length} bytes")
+
+            os.replace(part_path, target_path)
+            self._set_http_meta(url, r.headers)
         
-        for index, zip_path in enumerate(zip_files, 1):
-            zip_name_no_ext = os.path.splitext(os.path.basename(zip_path))[0]
-            self.log(f"[{index}/{total_zips}] Renaming & Extracting {zip_name_no_ext}...")
-            
+    def _preallocate(self, f, r):
+        # Reserve the whole file up front so the filesystem can allocate contiguous extents.
+        # Skipped for encoded responses, where Content-Length is not the decoded size
+        content_length = r.headers.get('Content-Length')
+        if content_length is None or r.headers.get('Content-Encoding') or not hasattr(os, 'posix_fallocate'):
+            return
+        try:
+            os.posix_fallocate(f.fileno(), 0, int(content_length))
+        except (OSError, ValueError):
+            pass
+
+    def _list_gmls(self, zip_path):
+        # GML files are read straight out of the ZIP through GDAL's /vsizip/ virtual
+        # filesystem, so nothing is extracted to disk
+        zip_name_no_ext = os.path.splitext(os.path.basename(zip_path))[0]
+        vsi_root = f"/vsizip/{os.path.abspath(zip_path)}"
+        with zipfile.ZipFile(zip_path, 'r') as zip_ref:
+            return [
+                (f"{vsi_root}/{member}", f"{zip_name_no_ext}_{os.path.basename(member)}")
+                for member in zip_ref.namelist() if member.endswith('.gml')
+            ]
+
+    def _retain_zip(self, zip_path, count):
+        with self.zip_lock:
+            self.pending_zips[zip_path] += count
+
+    def _release_zip(self, zip_path, success=True):
+        # Called once per GML when its data has been written (or skipped); the ZIP can
+        # be evicted from the cache once nothing from it is outstanding
+        with self.zip_lock:
+            if not success:
+                self.failed_zips.add(zip_path)
+            self.pending_zips[zip_path] -= 1
+            if self.pending_zips[zip_path] > 0:
+                return
+            del self.pending_zips[zip_path]
+            if zip_path in self.failed_zips:
+                return
+
+        self._evict_zip(zip_path)
+
+    def _evict_zip(self, zip_path):
+        # Called from the writer thread, so must never raise or the pipeline would stall
+        if self.keep_cache:
+            return
+        try:
+            os.remove(zip_path)
+            self.log(f"Removed from cache: {os.path.basename(zip_path)}")
+        except OSError as e:
+            self.log(f"Failed to remove {zip_path} from cache: {e}")
+
+    def _get_transformer(self, src_crs):
+        cache = getattr(self.transformers, 'cache', None)
+        if cache is None:
+            cache = self.transformers.cache = {}
+        key = src_crs.srs
+        if key not in cache:
+            cache[key] = pyproj.Transformer.from_crs(src_crs, self.target_crs, always_xy=True)
+        return cache[key]
+
+    def _reproject(self, gdf):
+        if gdf.crs is None:
+            # Let geopandas raise its usual error for data without a CRS
+            return gdf.to_crs(self.target_crs)
+
+        geoms = np.asarray(gdf.geometry.values)
+        present = geoms[~(shapely.is_missing(geoms) | shapely.is_empty(geoms))]
+        has_z = shapely.has_z(present)
+        include_z = bool(has_z.all()) and len(present) > 0
+        if has_z.any() and not include_z:
+            # Mixed 2D/3D data would gain NaN Z values below, so leave it to geopandas
+            return gdf.to_crs(self.target_crs)
+
+        transformer = self._get_transformer(gdf.crs)
+
+        def transform_coords(coords):
+            return np.column_stack(transformer.transform(*coords.T))
+
+        # Transform all coordinates of all geometries in one vectorised call
+        geoms = shapely.transform(geoms, transform_coords, include_z=include_z)
+        geometry = gpd.GeoSeries(geoms, index=gdf.index, crs=self.target_crs, name=gdf.geometry.name)
+        return gdf.set_geometry(geometry)
+
+    def _read_gml(self, gml_path, gml_name, zip_path, index, total, write_queue):
+        # Runs in a reader thread: parse and reproject, then hand over to the single writer
+        try:
+            gdf = pyogrio.read_dataframe(gml_path, columns=self.keep_columns, use_arrow=True)
+            if gdf.empty:
+                self._release_zip(zip_path)
+                return
+            if gdf.crs != self.target_crs:
+                gdf = self._reproject(gdf)
+        except Exception as e:
+            self.log(f"Error reading {gml_name}: {e}")
+            self._release_zip(zip_path, success=False)
+            return
+        write_queue.put((index, total, gml_name, zip_path, gdf))
+
+    def _parse_zip(self, zip_path, index, total, write_queue):
+        try:
+            gml_files = self._list_gmls(zip_path)
+        except Exception as e:
+            self.log(f"Failed to process {zip_path}: {e}")
+            return
+
+        if not gml_files:
+            # Nothing will ever be written from this ZIP, so nothing would release it
+            self._evict_zip(zip_path)
+            return
+
+        # Retain the ZIP for all its GMLs up front so it can't be evicted part-way through
+        self._retain_zip(zip_path, len(gml_files))
+        for gml_path, gml_name in gml_files:
+            self._read_gml(gml_path, gml_name, zip_path, index, total, write_queue)
+
+    def _parse_zips(self, dl_done_q, write_queue):
+        # Runs in a parser thread: each ZIP is parsed as soon as it has been downloaded.
+        # Decompression and parsing happen inside GDAL, which releases the GIL, so threads
+        # scale across cores without the pickling cost of a process pool
+        while True:
+            item = dl_done_q.get()
+            if item is None:
+                break
+            index, total, zip_path = item
+            self._parse_zip(zip_path, index, total, write_queue)
+
+    def _write_gdf(self, gdf, append):
+        pyogrio.write_dataframe(
+            gdf,
+            self.output_gpkg,
+            layer=self.output_layer,
+            driver="GPKG",
+            append=append,
+            promote_to_multi=True,
+            # Building the R-tree on every append is far slower than one bulk
+            # build at the end, see _create_spatial_index
+            layer_options={'SPATIAL_INDEX': 'NO'}
+        )
+
+    def _flush_batch(self, batch, batch_names, batch_zips, is_first):
+        gdf = batch[0] if len(batch) == 1 else pd.concat(batch, ignore_index=True)
+        try:
+            self._write_gdf(gdf, append=not is_first)
+            is_first = False
+            results = [True] * len(batch)
+        except Exception as e:
+            if len(batch) == 1:
+                self.log(f"Error merging {batch_names[0]}: {e}")
+                results = [False]
+            else:
+                # Retry one file at a time so a single bad file doesn't lose the whole batch
+                self.log(f"Error writing batch, retrying files individually: {e}")
+                results = []
+                for gml_name, gdf in zip(batch_names, batch):
+                    try:
+                        self._write_gdf(gdf, append=not is_first)
+                        is_first = False
+                        results.append(True)
+                    except Exception as file_error:
+                        self.log(f"Error merging {gml_name}: {file_error}")
+                        results.append(False)
+
+        for zip_path, success in zip(batch_zips, results):
+            self._release_zip(zip_path, success)
+        return is_first
+
+    def _write_gmls(self, write_queue):
+        # GDAL's GPKG driver does not support concurrent writers, so exactly one thread writes.
+        # GeoDataFrames are batched so each append transaction carries many files' worth of rows
+        batch, batch_names, batch_zips, batch_rows = [], [], [], 0
+        is_first = True
+        while True:
+            item = write_queue.get()
+            if self.writer_error is not None:
+                # After a fatal error keep draining, so parsers blocked on the bounded queue
+                # can finish and run_pipeline gets to report the error
+                if item is None:
+                    break
+                continue
+
             try:
-                with zipfile.ZipFile(zip_path, 'r') as zip_ref:
-                    gml_members = [m for m in zip_ref.namelist() if m.endswith('.gml')]
-                    for member in gml_members:
-                        unique_gml_name = f"{zip_name_no_ext}_{os.path.basename(member)}"
-                        target_path = os.path.join(self.extract_dir, unique_gml_name)
-                        with zip_ref.open(member) as source, open(target_path, "wb") as target:
-                            shutil.copyfileobj(source, target)
+                if item is not None:
+                    index, total, gml_name, zip_path, gdf = item
+                    self.log(f"[{index}/{total}] Consolidating {gml_name}...")
+                    batch.append(gdf)
+                    batch_names.append(gml_name)
+                    batch_zips.append(zip_path)
+                    batch_rows += len(gdf)
+                    if batch_rows < self.write_batch_rows:
+                        continue
+
+                if batch:
+                    self.log(f"Writing {batch_rows} features from {len(batch)} files...")
+                    is_first = self._flush_batch(batch, batch_names, batch_zips, is_first)
+                    batch, batch_names, batch_zips, batch_rows = [], [], [], 0
             except Exception as e:
-                self.log(f"Failed to process {zip_path}: {e}")
+                self.writer_error = e
+                self.log(f"Writer failed: {e}")
 
-    def _amalgamate_gmls(self):
-        gml_files = [os.path.join(self.extract_dir, f) for f in os.listdir(self.extract_dir) if f.endswith('.gml')]
-        if not gml_files:
+            if item is None:
+                break
+
+        if is_first and self.writer_error is None:
             self.log("No GML files found.")
+
+    def _create_spatial_index(self):
+        if not os.path.exists(self.output_gpkg):
             return
 
-        total_gmls = len(gml_files)
-        is_first = True
-        
+        self.log("Building spatial index...")
+        # Enable exceptions only for this call and restore the previous setting afterwards, so
+        # other GDAL users in the process are unaffected (ogr.ExceptionMgr needs GDAL 3.7+)
+        use_exceptions = ogr.GetUseExceptions()
+        ogr.UseExceptions()
+        try:
+            ds = ogr.Open(self.output_gpkg, update=1)
+            geom_column = ds.GetLayerByName(self.output_layer).GetGeometryColumn()
+            # Arguments are SQL string literals, so embedded quotes are doubled
+            table = self.output_layer.replace("'", "''")
+            column = geom_column.replace("'", "''")
+            result = ds.ExecuteSQL(f"SELECT CreateSpatialIndex('{table}', '{column}')")
+            if result is not None:
+                ds.ReleaseResultSet(result)
+            ds = None
+        except Exception as e:
+            self.log(f"Failed to build spatial index: {e}")
+        finally:
+            if not use_exceptions:
+                ogr.DontUseExceptions()
+
+    def run_pipeline(self, links):
+        # Downloading, parsing and writing overlap: each ZIP is parsed while later ones are
+        # still downloading, so total time is roughly max(network, CPU) rather than their sum
         if os.path.exists(self.output_gpkg):
             os.remove(self.output_gpkg)
 
-        for index, gml_path in enumerate(gml_files, 1):
-            self.log(f"[{index}/{total_gmls}] Consolidating {os.path.basename(gml_path)}...")
-            try:
-                gdf = gpd.read_file(gml_path, engine='pyogrio', use_arrow=True)
-                if not gdf.empty:
-                    if gdf.crs != self.target_crs:
-                        gdf = gdf.to_crs(self.target_crs)
-                    mode = 'w' if is_first else 'a'
-                    gdf.to_file(self.output_gpkg, driver="GPKG", engine='pyogrio', mode=mode)
-                    is_first = False
-            except Exception as e:
-                self.log(f"Error merging {os.path.basename(gml_path)}: {e}")
+        # The output is rebuilt from scratch on every run, so SQLite durability isn't needed
+        pyogrio.set_gdal_config_options({
+            'OGR_SQLITE_SYNCHRONOUS': 'OFF',
+            'OGR_SQLITE_JOURNAL': 'MEMORY',
+        })
+
+        try:
+            parse_workers = self.parse_workers
+            dl_done_q = queue.Queue()
+
+            # Bounded so that readers can't get too far ahead of the writer and exhaust memory
+            write_queue = queue.Queue(maxsize=2 * parse_workers)
+
+            self.writer_error = None
+            writer = threading.Thread(target=self._write_gmls, args=(write_queue,), daemon=True)
+            writer.start()
+
+            parsers = [
+                threading.Thread(target=self._parse_zips, args=(dl_done_q, write_queue), daemon=True)
+                for _ in range(parse_workers)
+            ]
+            for parser in parsers:
+                parser.start()
+
+            self.run_downloads(links, dl_done_q)
+            self.session.close()
+
+            # One sentinel per parser, then one for the writer once all parsers have finished
+            for _ in parsers:
+                dl_done_q.put(None)
+            for parser in parsers:
+                parser.join()
+
+            write_queue.put(None)
+            writer.join()
+            if self.writer_error is not None:
+                raise self.writer_error
+
+            self._create_spatial_index()
+        finally:
+            # These options are process-wide, so never leave them set for the host process
+            pyogrio.set_gdal_config_options({
+                'OGR_SQLITE_SYNCHRONOUS': None,
+                'OGR_SQLITE_JOURNAL': None,
+            })
 
     def run(self):
         signal.signal(signal.SIGINT, lambda sig, frame: os._exit(0))
@@ -168,16 +677,9 @@ class openinspire:
             self.log("No links found.")
             return
 
-        self.log("--- Phase 1: Downloading ---")
-        self.run_downloads(links)
-
-        self.log("--- Phase 2: Unzipping ---")
-        self._unzip_all()
-
-        self.log("--- Phase 3: Amalgamating ---")
-        self._amalgamate_gmls()
+        self.log("--- Downloading and Amalgamating ---")
+        self.run_pipeline(links)
         
-        shutil.rmtree(self.extract_dir)
         self.log("Success: Process complete.")
 
 def main():